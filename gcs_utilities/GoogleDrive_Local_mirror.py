@@ -1,14 +1,51 @@
-import io
+# Drive v3 REST endpoints used (called directly through an AuthorizedSession):
+#   GET https://www.googleapis.com/drive/v3/files                      files.list
+#   GET https://www.googleapis.com/drive/v3/files/{id}?alt=media       files.get (content)
+#   GET https://www.googleapis.com/drive/v3/changes/startPageToken     changes.getStartPageToken
+#   GET https://www.googleapis.com/drive/v3/changes                    changes.list
+
+import os
+import json
 import yaml
+import hashlib
 import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from drive_sync import (
+    FOLDER_MIME, list_folder_files, load_sync_state, save_sync_state, file_md5, is_synced
+)
+
+DRIVE_FILES_URL   = "https://www.googleapis.com/drive/v3/files"
+DRIVE_CHANGES_URL = "https://www.googleapis.com/drive/v3/changes"
+CHANGE_FIELDS     = (
+    "nextPageToken,newStartPageToken,"
+    "changes(fileId,file(id,name,parents,mimeType,md5Checksum,size,trashed))"
+)
+CHANGE_STATE_FILE = ".drive_sync_state.json"
+MAX_WORKERS       = 16
+COPY_BUFFER       = 1 << 20
+
+# Files up to SMALL_FILE_MAX are fetched in one body and written with a single syscall;
+# files above RANGE_THRESHOLD are fetched as parallel byte ranges
+SMALL_FILE_MAX  = 1 << 20
+RANGE_THRESHOLD = 64 * 1024 * 1024
+RANGE_SIZE      = 16 * 1024 * 1024
+RANGE_WORKERS   = 8
+
+# Range GETs from every large file share one bounded pool, so at most
+# MAX_WORKERS + RANGE_WORKERS requests are ever in flight against Drive
+RANGE_POOL = ThreadPoolExecutor(max_workers=RANGE_WORKERS)
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
+@functools.lru_cache(maxsize=None)
 def load_business_config(config_path):
-    with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+    with open(config_path, "rb") as f:
+        return yaml.load(f, Loader=YAML_LOADER)
 
 def get_args():
     p = argparse.ArgumentParser(
@@ -20,6 +57,139 @@ def get_args():
     )
     return p.parse_args()
 
+def drive_get(session, url, **params):
+    """One Drive GET; returns the decoded JSON body."""
+    resp = session.get(url, params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+def get_start_page_token(session):
+    return drive_get(session, f"{DRIVE_CHANGES_URL}/startPageToken")["startPageToken"]
+
+def list_changed_files(session, page_token, folder_id):
+    """Files in folder_id changed since page_token, plus the token to resume from next time."""
+    changed = {}
+    while True:
+        resp = drive_get(
+            session, DRIVE_CHANGES_URL,
+            pageToken=page_token, pageSize=1000, fields=CHANGE_FIELDS
+        )
+        for change in resp.get("changes", []):
+            f = change.get("file")
+            if (f and not f.get("trashed") and f.get("mimeType") != FOLDER_MIME
+                    and folder_id in f.get("parents", [])):
+                changed[f["id"]] = f
+        if "newStartPageToken" in resp:
+            return list(changed.values()), resp["newStartPageToken"]
+        page_token = resp["nextPageToken"]
+
+def load_change_token(root):
+    """Saved {"folder_id", "start_page_token"} from the last complete sync."""
+    try:
+        with open(root / CHANGE_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_change_token(root, folder_id, token):
+    with open(root / CHANGE_STATE_FILE, "w") as f:
+        json.dump({"folder_id": folder_id, "start_page_token": token}, f)
+
+def make_session(creds):
+    """AuthorizedSession whose connection pool is shared by all download workers."""
+    session = AuthorizedSession(creds)
+    # sized to the most requests that can run at once: one per file worker plus the range pool
+    adapter = HTTPAdapter(pool_maxsize=MAX_WORKERS + RANGE_WORKERS)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_range(session, url, fd, start, end):
+    """GET bytes start..end (inclusive) of url and write them at the same offset of fd."""
+    headers = {"Range": f"bytes={start}-{end}"}
+    with session.get(url, headers=headers, stream=True) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise IOError(f"Range request ignored for {url} (status {r.status_code})")
+        offset = start
+        for chunk in r.iter_content(chunk_size=COPY_BUFFER):
+            view = memoryview(chunk)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view    = view[written:]
+                offset += written
+    if offset != end + 1:
+        raise IOError(f"Short read for bytes {start}-{end} of {url}")
+
+def download_ranged(session, url, dest, size):
+    """Download url into a pre-sized dest as RANGE_SIZE range GETs on RANGE_POOL; returns its md5."""
+    fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Reserve every block up front so the ranges land in contiguous extents
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+        futures = [
+            RANGE_POOL.submit(fetch_range, session, url, fd, start, min(start + RANGE_SIZE, size) - 1)
+            for start in range(0, size, RANGE_SIZE)
+        ]
+        # every range must finish before fd is closed, even if one of them failed
+        wait(futures)
+        for fut in futures:
+            fut.result()
+        # Ranges finish out of order, so hash once they're all in, while the pages are still cached
+        digest = file_md5(dest)
+        # After the check the mirror isn't read again; don't let a big file evict the page cache
+        if hasattr(os, "posix_fadvise"):
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return digest
+
+def write_small(dest, data):
+    """Write a whole small file with one open/write/close, bypassing buffered IO."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd = os.open(dest, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def verify_download(dest, file_meta, digest):
+    """Check a fresh download's md5 against Drive's md5Checksum; a bad copy is removed."""
+    expected = file_meta.get("md5Checksum")
+    if expected and digest != expected:
+        dest.unlink()
+        raise IOError(f"md5 mismatch for {file_meta['name']}; partial or corrupt download removed")
+
+def download_one(session, file_meta, local_target):
+    """Download a single Drive file into local_target and verify its md5."""
+    url  = f"{DRIVE_FILES_URL}/{file_meta['id']}?alt=media"
+    dest = local_target / file_meta["name"]
+    size = int(file_meta.get("size", 0))
+    if size > RANGE_THRESHOLD and hasattr(os, "pwrite"):
+        digest = download_ranged(session, url, dest, size)
+    elif size <= SMALL_FILE_MAX:
+        r = session.get(url)
+        r.raise_for_status()
+        write_small(dest, r.content)
+        digest = hashlib.md5(r.content).hexdigest()
+    else:
+        # hash each block on its way to disk instead of reading the file back afterwards
+        md5 = hashlib.md5()
+        with session.get(url, stream=True) as r:
+            r.raise_for_status()
+            with open(dest, "wb") as fh:
+                for block in iter(lambda: r.raw.read(COPY_BUFFER), b""):
+                    md5.update(block)
+                    fh.write(block)
+        digest = md5.hexdigest()
+    verify_download(dest, file_meta, digest)
+    return file_meta["name"]
+
 def main():
     args = get_args()
     cfg = load_business_config(args.config)
@@ -34,10 +204,11 @@ def main():
     creds  = service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT, scopes=SCOPES
     )
-    drive = build("drive", "v3", credentials=creds, cache_discovery=False)
+    session = make_session(creds)
 
     # 1) Grab the single most-recent folder under your root:
-    resp = drive.files().list(
+    resp = drive_get(
+        session, DRIVE_FILES_URL,
         q=(
             f"'{DRIVE_ROOT_ID}' in parents "
             "and mimeType='application/vnd.google-apps.folder' "
@@ -46,7 +217,7 @@ def main():
         orderBy="createdTime desc",
         pageSize=1,
         fields="files(id,name,createdTime)"
-    ).execute()
+    )
 
     folders = resp.get("files", [])
     if not folders:
@@ -60,25 +231,44 @@ def main():
     local_target = LOCAL_MEDIA_ROOT / drive_folder_name
     local_target.mkdir(parents=True, exist_ok=True)
 
-    # 3) List and download new files
-    resp = drive.files().list(
-        q=f"'{drive_folder_id}' in parents and trashed=false",
-        fields="files(id,name)"
-    ).execute()
-
-    existing = {p.name for p in local_target.iterdir() if p.is_file()}
-    for f in resp.get("files", []):
-        name = f["name"]
-        if name in existing:
-            continue
-        request = drive.files().get_media(fileId=f["id"])
-        dest = local_target / name
-        with io.FileIO(dest, "wb") as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                _, done = downloader.next_chunk()
-        print(f"Downloaded ▼ {name}")
+    # 3) Ask Drive only for what changed since the last sync of this folder;
+    #    a new folder (or first run) needs a full listing
+    saved = load_change_token(LOCAL_MEDIA_ROOT)
+    if saved.get("folder_id") == drive_folder_id:
+        files, next_token = list_changed_files(session, saved["start_page_token"], drive_folder_id)
+        print(f"🔁 {len(files)} changed file(s) since last sync")
+    else:
+        # take the token before listing so changes made during the listing aren't lost
+        next_token = get_start_page_token(session)
+        list_files = functools.partial(drive_get, session, DRIVE_FILES_URL)
+        # folders are skipped here just as list_changed_files skips them
+        files      = list_folder_files(list_files, drive_folder_id, skip_folders=True)
+
+    # 4) Download new or changed files
+    state    = load_sync_state(local_target)
+    with os.scandir(local_target) as it:
+        existing = {e.name for e in it if e.is_file()}
+    new_files = [
+        f for f in files
+        if f["name"] not in existing
+        or not is_synced(local_target / f["name"], f, state)
+    ]
+
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {
+                pool.submit(download_one, session, f, local_target): f
+                for f in new_files
+            }
+            for fut in as_completed(futures):
+                name = fut.result()
+                st   = (local_target / name).stat()
+                state[name] = [st.st_size, st.st_mtime_ns, futures[fut].get("md5Checksum")]
+                print(f"Downloaded ▼ {name}")
+        # only advance the token once every download has landed
+        save_change_token(LOCAL_MEDIA_ROOT, drive_folder_id, next_token)
+    finally:
+        save_sync_state(local_target, state)
 
 if __name__ == "__main__":
     main()
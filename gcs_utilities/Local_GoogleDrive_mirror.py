@@ -1,15 +1,44 @@
 #push local media files to Google Drive
+#
+# Drive v3 REST endpoints used (called directly through an AuthorizedSession):
+#   GET   https://www.googleapis.com/drive/v3/files                        files.list
+#   POST  https://www.googleapis.com/drive/v3/files                        files.create (folder)
+#   POST  https://www.googleapis.com/upload/drive/v3/files?uploadType=...  files.create (media)
+#   PATCH https://www.googleapis.com/upload/drive/v3/files/{id}?uploadType=...  files.update (media)
+#   PUT   <resumable session URI>                                          upload chunks / status
 
-import io
+import os
+import json
+import time
+import uuid
 import yaml
+import random
+import mimetypes
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from drive_sync import (
+    SYNC_STATE_FILE, list_folder_files, load_sync_state, save_sync_state, is_synced
+)
+
+DRIVE_FILES_URL  = "https://www.googleapis.com/drive/v3/files"
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+MAX_WORKERS      = min(8, (os.cpu_count() or 2) * 5)  # >5 streams per core stops helping
+UPLOAD_CHUNK     = 64 * 1024 * 1024
+RESUMABLE_MIN    = 8 * 1024 * 1024
+MAX_ATTEMPTS     = 100
+MAX_BACKOFF      = 32
+RETRY_STATUS     = {429, 500, 502, 503, 504}
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 # 1. Load config
-with open("business_config.yaml") as f:
-    cfg = yaml.safe_load(f)
+with open("business_config.yaml", "rb") as f:
+    cfg = yaml.load(f, Loader=YAML_LOADER)
 
 DRIVE_ROOT_ID       = cfg["google_drive_folder_id"]
 SERVICE_ACCOUNT_KEY = cfg["service_account_file"]
@@ -24,16 +53,45 @@ SCOPES = ["https://www.googleapis.com/auth/drive"]
 creds  = service_account.Credentials.from_service_account_file(
     SERVICE_ACCOUNT_KEY, scopes=SCOPES
 )
-drive = build("drive", "v3", credentials=creds, cache_discovery=False)
+session = AuthorizedSession(creds)
+session.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
+
+# One upload pool for the whole script. The semaphore bounds how many uploads
+# are queued or running, so a huge folder isn't submitted all at once.
+EX = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+_upload_slots = threading.BoundedSemaphore(MAX_WORKERS * 2)
+
+def backoff(attempt):
+    time.sleep(min(2 ** attempt, MAX_BACKOFF) + random.random())
+
+def send_with_retry(method, url, **kwargs):
+    """Send a Drive request, backing off exponentially on 429/5xx and connection errors."""
+    for attempt in range(MAX_ATTEMPTS):
+        last = attempt == MAX_ATTEMPTS - 1
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if last:
+                raise
+        else:
+            if resp.status_code not in RETRY_STATUS or last:
+                return resp
+        backoff(attempt)
+
+def list_files(**params):
+    """One files.list call; returns the decoded JSON page."""
+    resp = send_with_retry("GET", DRIVE_FILES_URL, params=params)
+    resp.raise_for_status()
+    return resp.json()
 
 def find_or_create_folder(name, parent_id):
     """Returns folder ID for name under parent, creating it if needed."""
-    resp = drive.files().list(
+    resp = list_files(
         q=f"'{parent_id}' in parents and name='{name}' "
           "and mimeType='application/vnd.google-apps.folder' "
           "and trashed=false",
         fields="files(id)"
-    ).execute()
+    )
     files = resp.get("files", [])
     if files:
         return files[0]["id"]
@@ -42,25 +100,115 @@ def find_or_create_folder(name, parent_id):
         "mimeType": "application/vnd.google-apps.folder",
         "parents": [parent_id]
     }
-    return drive.files().create(body=meta, fields="id").execute()["id"]
+    resp = send_with_retry("POST", DRIVE_FILES_URL, params={"fields": "id"}, json=meta)
+    resp.raise_for_status()
+    return resp.json()["id"]
+
+def upload_multipart(method, url, metadata, file: Path, mime_type):
+    """Send metadata and content together in one multipart/related request."""
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n".encode(),
+        json.dumps(metadata).encode(),
+        f"\r\n--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n".encode(),
+        file.read_bytes(),
+        f"\r\n--{boundary}--".encode(),
+    ])
+    resp = send_with_retry(
+        method, url,
+        params={"uploadType": "multipart"},
+        data=body,
+        headers={"Content-Type": f"multipart/related; boundary={boundary}"}
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+def upload_resumable(method, url, metadata, file: Path, mime_type):
+    """Upload file through a resumable session in UPLOAD_CHUNK pieces.
+
+    After a failed chunk the session is asked how many bytes it committed,
+    so the upload continues from there instead of starting over.
+    """
+    size = file.stat().st_size
+    resp = send_with_retry(
+        method, url,
+        params={"uploadType": "resumable"},
+        json=metadata,
+        headers={"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(size)}
+    )
+    resp.raise_for_status()
+    session_uri = resp.headers["Location"]
+
+    offset, attempt = 0, 0
+    with open(file, "rb") as fh:
+        while True:
+            fh.seek(offset)
+            chunk = fh.read(UPLOAD_CHUNK)
+            headers = {"Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"}
+            try:
+                resp = session.put(session_uri, data=chunk, headers=headers, allow_redirects=False)
+                failed = resp.status_code in RETRY_STATUS
+            except (requests.ConnectionError, requests.Timeout):
+                failed = True
+            if failed:
+                attempt += 1
+                if attempt == MAX_ATTEMPTS:
+                    raise IOError(f"Giving up on {file.name} after {MAX_ATTEMPTS} attempts")
+                backoff(attempt)
+                resp = send_with_retry(
+                    "PUT", session_uri,
+                    headers={"Content-Range": f"bytes */{size}"},
+                    allow_redirects=False
+                )
+            # 308 means "keep going"; its Range header says what the server has so far
+            if resp.status_code != 308:
+                resp.raise_for_status()
+                return resp.json()
+            committed = resp.headers.get("Range")
+            offset = int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
+
+def upload_one(file: Path, meta, drive_folder_id: str):
+    """Upload a single file, replacing the Drive copy when meta is given."""
+    mime_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+    # small files go up in one simple request; only large ones pay for a resumable session
+    upload = upload_resumable if file.stat().st_size > RESUMABLE_MIN else upload_multipart
+    if meta:
+        # same name, different content: replace it instead of adding a duplicate
+        upload("PATCH", f"{DRIVE_UPLOAD_URL}/{meta['id']}", {}, file, mime_type)
+        return f"Updated ▶ {file.name}"
+    metadata = {"name": file.name, "parents": [drive_folder_id]}
+    upload("POST", DRIVE_UPLOAD_URL, metadata, file, mime_type)
+    return f"Uploaded ▶ {file.name}"
+
+def submit_upload(file: Path, meta, drive_folder_id: str):
+    """Queue upload_one on EX, blocking while the queue is full."""
+    _upload_slots.acquire()
+    fut = EX.submit(upload_one, file, meta, drive_folder_id)
+    fut.add_done_callback(lambda _: _upload_slots.release())
+    return fut
 
 def upload_new_files(local_folder: Path, drive_folder_id: str):
-    """Upload any files in local_folder that don't already exist in Drive."""
-    # list existing file names in that Drive folder
-    resp = drive.files().list(
-        q=f"'{drive_folder_id}' in parents and trashed=false",
-        fields="files(name)"
-    ).execute()
-    existing = {f["name"] for f in resp.get("files", [])}
-
-    for file in local_folder.iterdir():
-        if file.is_file() and file.name not in existing:
-            media = MediaFileUpload(str(file), resumable=True)
-            drive.files().create(
-                body={"name": file.name, "parents": [drive_folder_id]},
-                media_body=media
-            ).execute()
-            print(f"Uploaded ▶ {file.name}")
+    """Upload files in local_folder that are missing or changed in Drive."""
+    remote = {f["name"]: f for f in list_folder_files(list_files, drive_folder_id)}
+    state  = load_sync_state(local_folder)
+
+    try:
+        # hashing the next candidates overlaps with uploads already in flight
+        futures = []
+        with os.scandir(local_folder) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name == SYNC_STATE_FILE:
+                    continue
+                file = Path(entry.path)
+                meta = remote.get(entry.name)
+                if meta and is_synced(file, meta, state):
+                    continue
+                futures.append(submit_upload(file, meta, drive_folder_id))
+
+        for fut in as_completed(futures):
+            print(fut.result())
+    finally:
+        save_sync_state(local_folder, state)
 
 if __name__ == "__main__":
     # create/find a folder named like your local one (e.g. "pics194")
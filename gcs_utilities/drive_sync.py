@@ -0,0 +1,70 @@
+#shared Drive listing and local sync-state helpers for the two mirror scripts
+
+import os
+import json
+import mmap
+import hashlib
+
+LIST_FIELDS     = "nextPageToken, files(id,name,md5Checksum,size)"
+SYNC_STATE_FILE = ".sync_state.json"
+FOLDER_MIME     = "application/vnd.google-apps.folder"
+
+def list_folder_files(list_files, folder_id, skip_folders=False):
+    """Return metadata for every file in a Drive folder, paging 1000 at a time.
+
+    list_files takes files.list query parameters and returns one decoded page.
+    With skip_folders, subfolders are left out of the listing.
+    """
+    q = f"'{folder_id}' in parents and trashed=false"
+    if skip_folders:
+        q += f" and mimeType != '{FOLDER_MIME}'"
+    query = {
+        "q": q,
+        "pageSize": 1000,
+        "fields": LIST_FIELDS,
+    }
+    resp  = list_files(**query)
+    files = resp.get("files", [])
+    while resp.get("nextPageToken"):
+        resp = list_files(**query, pageToken=resp["nextPageToken"])
+        files.extend(resp.get("files", []))
+    return files
+
+def load_sync_state(folder):
+    """Cached {name: [size, mtime_ns, md5]} for files already hashed in folder."""
+    try:
+        with open(folder / SYNC_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_sync_state(folder, state):
+    with open(folder / SYNC_STATE_FILE, "w") as f:
+        json.dump(state, f)
+
+def file_md5(path):
+    """md5 of path, hashed straight from a read-only memory map."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.md5().hexdigest()  # mmap can't map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.md5(mm).hexdigest()
+
+def local_md5(path, state):
+    """md5 of path, reusing the cached digest while size and mtime are unchanged."""
+    st = path.stat()
+    cached = state.get(path.name)
+    if cached and cached[:2] == [st.st_size, st.st_mtime_ns]:
+        return cached[2]
+    digest = file_md5(path)
+    state[path.name] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+def is_synced(path, file_meta, state):
+    """True if the local file at path holds the same bytes as the Drive file."""
+    if "md5Checksum" not in file_meta:
+        # Google-native docs carry no checksum; fall back to the name match
+        return True
+    if path.stat().st_size != int(file_meta["size"]):
+        return False
+    return local_md5(path, state) == file_meta["md5Checksum"]
@@ -8,18 +8,28 @@ to keep all assets private and secure. It also prevents accidental overwrites.
 import os
 import sys
 import yaml
+import functools
 from pathlib import Path
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
 from google.oauth2 import service_account
 
+# Files above this size are split into parts uploaded in parallel (XML multipart upload)
+PARALLEL_UPLOAD_THRESHOLD = 150 * 1024 * 1024
+PARALLEL_CHUNK_SIZE       = 32 * 1024 * 1024
+PARALLEL_MAX_WORKERS      = 8
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # --- Configuration Loading ---
 
+@functools.lru_cache(maxsize=None)
 def load_credentials():
     """Loads service account key path from credentials.yml."""
     print("→ Loading credentials...")
     try:
-        with open('credentials.yml', 'r') as file:
-            creds = yaml.safe_load(file)
+        with open('credentials.yml', 'rb') as file:
+            creds = yaml.load(file, Loader=YAML_LOADER)
             key_path = creds['gcs_service_account_key_file']
             if not Path(key_path).is_file():
                 print(f"❌ Service account JSON not found at path specified in credentials.yml: {key_path}")
@@ -30,12 +40,13 @@ def load_credentials():
         print(f"❌ Error loading credentials.yml: {e}. Make sure the file exists and contains 'gcs_service_account_key_file'.")
         sys.exit(1)
 
+@functools.lru_cache(maxsize=None)
 def load_business_config():
     """Loads GCS upload settings from the existing business_config.yaml structure."""
     print("→ Loading business configuration...")
     try:
-        with open('business_config.yaml', 'r') as file:
-            config = yaml.safe_load(file)
+        with open('business_config.yaml', 'rb') as file:
+            config = yaml.load(file, Loader=YAML_LOADER)
 
             # Get values from the user's existing config structure
             local_file_str = config['instagram_local_media_path']
@@ -88,7 +99,18 @@ def main():
     print(f"→ Uploading '{local_file.name}' to 'gs://{config['bucket_name']}/{config['destination_blob_name']}'...")
     try:
         # Upload file (allows overwriting existing files)
-        blob.upload_from_filename(str(local_file))
+        if local_file.stat().st_size > PARALLEL_UPLOAD_THRESHOLD:
+            print(f"→ Large file; uploading in {PARALLEL_CHUNK_SIZE // (1024 * 1024)} MiB parts with {PARALLEL_MAX_WORKERS} workers...")
+            transfer_manager.upload_chunks_concurrently(
+                str(local_file), blob,
+                chunk_size=PARALLEL_CHUNK_SIZE,
+                max_workers=PARALLEL_MAX_WORKERS,
+                # threads share this client and its token (the default pool of 10 covers
+                # the workers); processes would each rebuild a client and re-authenticate
+                worker_type=transfer_manager.THREAD
+            )
+        else:
+            blob.upload_from_filename(str(local_file))
         print("✅ Upload successful. The file remains private.")
         print("\n---")
         print("Object Details:")
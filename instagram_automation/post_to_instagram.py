@@ -11,35 +11,61 @@ import requests
 import time
 import yaml
 import sys
-from google.cloud import storage
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from google.cloud.storage._signing import generate_signed_url_v4
+from google.oauth2 import service_account
+from urllib.parse import quote
 from datetime import timedelta
 
 API_VERSION = "v19.0"
 BASE_URL    = f"https://graph.facebook.com/{API_VERSION}"
+TIMEOUT     = (5, 30)  # (connect, read) seconds
 
+# libyaml's C parser when PyYAML was built with it, else the pure-Python one
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# One pooled session so every Graph API call reuses the same TLS connection.
+# Retry only covers idempotent methods, so container creation/publish are never re-sent.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=5, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+))
+
+@functools.lru_cache(maxsize=None)
 def load_credentials():
-    with open("credentials.yml", "r") as f:
-        creds = yaml.safe_load(f)
+    with open("credentials.yml", "rb") as f:
+        creds = yaml.load(f, Loader=YAML_LOADER)
     return (
         creds["instagram_id"],            # Your IG Business Account ID
         creds["page_access_token"],       # Long‑lived Page access token
         creds["service_account_file"]     # Path to your GCS service account JSON
     )
 
+@functools.lru_cache(maxsize=None)
 def load_business_config():
-    with open("business_config.yaml", "r") as f:
-        cfg = yaml.safe_load(f)["instagram_post"]
+    with open("business_config.yaml", "rb") as f:
+        cfg = yaml.load(f, Loader=YAML_LOADER)["instagram_post"]
     return (
         cfg["gcs_bucket_name"],           # e.g. "my-private-bucket"
         cfg["gcs_object_name"],           # e.g. "videos/my_reel.mp4"
         cfg["caption"]                    # Your reel caption; generated via a RAG pipeline
     )
 
+@functools.lru_cache(maxsize=None)
+def load_signing_credentials(keyfile):
+    # V4 signing only needs the service account's private key, not a live storage.Client
+    return service_account.Credentials.from_service_account_file(keyfile)
+
 def generate_signed_url(keyfile, bucket, obj, expiration_minutes=15):
-    client = storage.Client.from_service_account_json(keyfile)
-    blob   = client.bucket(bucket).blob(obj)
-    return blob.generate_signed_url(
-        version="v4",
+    creds = load_signing_credentials(keyfile)
+    return generate_signed_url_v4(
+        creds,
+        resource=f"/{bucket}/{quote(obj, safe='/~')}",
         expiration=timedelta(minutes=expiration_minutes),
         method="GET",
         query_parameters={"alt": "media"}  # ensure raw bytes
@@ -47,14 +73,14 @@ def generate_signed_url(keyfile, bucket, obj, expiration_minutes=15):
 
 def verify_url(url):
     print("→ Verifying signed URL…")
-    resp = requests.head(url)
+    resp = SESSION.head(url, timeout=TIMEOUT)
     resp.raise_for_status()
     ct = resp.headers.get("Content-Type", "")
     print(f"✅ URL reachable (status {resp.status_code}, content-type {ct})\n")
 
 def create_media_container(ig_id, token, video_url, caption):
     print("→ Creating IG media container…")
-    resp = requests.post(
+    resp = SESSION.post(
         f"{BASE_URL}/{ig_id}/media",
         data={
             "media_type":   "REELS",
@@ -62,41 +88,55 @@ def create_media_container(ig_id, token, video_url, caption):
             "caption":      caption,
             "share_to_feed":"true",
             "access_token": token
-        }
+        },
+        timeout=TIMEOUT
     )
     resp.raise_for_status()
     container_id = resp.json()["id"]
     print("✅ Container ID:", container_id, "\n")
     return container_id
 
-def wait_until_finished(container_id, token, interval=5):
+def wait_until_finished(container_id, token, max_interval=15.0, timeout=600):
     print("→ Polling for processing status…")
-    while True:
-        resp = requests.get(
+    delay    = 1.0
+    deadline = time.monotonic() + timeout
+    etag     = None
+    status   = None
+    while time.monotonic() < deadline:
+        # Send back the last ETag so an unchanged status comes back as an empty 304
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = SESSION.get(
             f"{BASE_URL}/{container_id}",
             params={
                 "fields":       "status_code",
                 "access_token": token
-            }
+            },
+            headers=headers,
+            timeout=TIMEOUT
         )
-        resp.raise_for_status()
-        status = resp.json().get("status_code")
-        print("   status_code =", status)
-        if status == "FINISHED":
-            print("✅ Video processing complete.\n")
-            return
-        if status == "ERROR":
-            raise RuntimeError("Processing failed: " + str(resp.json()))
-        time.sleep(interval)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+            etag   = resp.headers.get("ETag")
+            status = resp.json().get("status_code")
+            print("   status_code =", status)
+            if status == "FINISHED":
+                print("✅ Video processing complete.\n")
+                return
+            if status == "ERROR":
+                raise RuntimeError("Processing failed: " + str(resp.json()))
+        time.sleep(delay)
+        delay = min(delay * 1.5, max_interval)
+    raise TimeoutError(f"Container {container_id} not FINISHED after {timeout}s (last status {status})")
 
 def publish_media(ig_id, token, creation_id):
     print("→ Publishing media container…")
-    resp = requests.post(
+    resp = SESSION.post(
         f"{BASE_URL}/{ig_id}/media_publish",
         data={
             "creation_id":  creation_id,
             "access_token": token
-        }
+        },
+        timeout=TIMEOUT
     )
     resp.raise_for_status()
     media_id = resp.json()["id"]
@@ -109,9 +149,13 @@ def main():
 
     signed_url   = generate_signed_url(keyfile, bucket, obj, expiration_minutes=15)
     print("🔗 Signed URL:\n", signed_url, "\n")
-    verify_url(signed_url)
 
-    container_id = create_media_container(ig_id, access_token, signed_url, caption)
+    # The HEAD check and container creation hit different hosts, so overlap the two round trips
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        verify    = pool.submit(verify_url, signed_url)
+        container = pool.submit(create_media_container, ig_id, access_token, signed_url, caption)
+        verify.result()
+        container_id = container.result()
     wait_until_finished(container_id, access_token)
     publish_media(ig_id, access_token, container_id)
 
@@ -1,19 +1,26 @@
 import os
 import re
+import functools
 import random
 import requests
 import shutil
+import subprocess
+import tempfile
 import yaml
-from moviepy.editor import (ImageClip, concatenate_videoclips, AudioFileClip, 
-                            CompositeVideoClip, ColorClip)
-from moviepy.video.fx import all as vfx 
+
+try:
+    import pyvips  # optional: libvips shrink-on-load for large source photos
+except (ImportError, OSError):
+    pyvips = None
 
 # --- Configuration ---
 
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # Freesound API Key
 try:
-    with open('credentials.yml', 'r') as file:
-        FREESOUND_API_KEY = yaml.safe_load(file)['freesound']
+    with open('credentials.yml', 'rb') as file:
+        FREESOUND_API_KEY = yaml.load(file, Loader=YAML_LOADER)['freesound']
 except FileNotFoundError:
     print("Error: `credentials.yml` not found. Please create it with your Freesound API key.")
     exit()
@@ -21,6 +28,10 @@ except KeyError:
     print("Error: 'freesound' key not found in `credentials.yml`.")
     exit()
 
+# Reused across Freesound calls so repeated searches and downloads keep their connections alive
+SESSION = requests.Session()
+COPY_BUFFER = 1 << 20
+
 # List of queries for background music suitable for showcasing masonry
 MUSIC_QUERIES = [
     "corporate",
@@ -31,6 +42,9 @@ MUSIC_QUERIES = [
     "powerful"
 ]
 
+# Digit runs in filenames, compiled once for natural_sort_key
+_NAT_RE = re.compile(r'([0-9]+)')
+
 # --- Functions ---
 
 def get_freesound_music(query, duration_range=(30, 300)):
@@ -46,7 +60,7 @@ def get_freesound_music(query, duration_range=(30, 300)):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = SESSION.get(url, headers=headers, params=params)
         response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from Freesound: {e}")
@@ -65,10 +79,11 @@ def get_freesound_music(query, duration_range=(30, 300)):
     music_path = f"/tmp/{safe_filename}.mp3"
 
     try:
-        with requests.get(music_url, stream=True) as r:
+        with SESSION.get(music_url, stream=True) as r:
             r.raise_for_status()
+            r.raw.decode_content = True  # undo any gzip transfer encoding
             with open(music_path, "wb") as music_file:
-                shutil.copyfileobj(r.raw, music_file)
+                shutil.copyfileobj(r.raw, music_file, length=COPY_BUFFER)
     except requests.exceptions.RequestException as e:
         print(f"Error downloading music file: {e}")
         return None
@@ -76,11 +91,11 @@ def get_freesound_music(query, duration_range=(30, 300)):
     print(f"Selected music: {selected_sound['name']} (Duration: {selected_sound['duration']:.2f}s)")
     return music_path
 
-def natural_sort_key(s):
+def natural_sort_key(s, _split=_NAT_RE.split):
     """
     Provides a key for natural sorting of filenames (e.g., 'image1', 'image2', 'image10').
     """
-    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
+    return tuple(int(text) if text.isdigit() else text.lower() for text in _split(s))
 
 def cleanup_temp_file(file_path):
     """
@@ -90,6 +105,62 @@ def cleanup_temp_file(file_path):
         os.remove(file_path)
         print(f"Cleaned up temporary file: {file_path}")
 
+@functools.lru_cache(maxsize=None)
+def video_encoder_args():
+    """
+    Returns ffmpeg video-encoder arguments, preferring NVIDIA's NVENC when it actually works here.
+    """
+    probe = ["ffmpeg", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "color=black:s=256x256", "-frames:v", "1",
+             "-c:v", "h264_nvenc", "-f", "null", "-"]
+    try:
+        # Listing the encoder isn't enough; a 1-frame encode confirms a usable GPU is present
+        nvenc_ok = subprocess.run(probe, capture_output=True, timeout=30).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        nvenc_ok = False
+
+    if nvenc_ok:
+        print("Using NVENC hardware encoder.")
+        return ["-c:v", "h264_nvenc", "-preset", "p5", "-rc", "vbr", "-cq", "21",
+                "-b:v", "8000k", "-maxrate", "10M"]
+    return ["-c:v", "libx264",
+            "-b:v", "8000k",       # Set a high bitrate for better quality
+            "-preset", "slow"]     # Use a slower preset for better compression
+
+def shrink_images(image_paths, target_size, work_dir):
+    """
+    Pre-shrinks images larger than target_size with libvips and returns the paths to feed ffmpeg.
+    Shrunk copies keep their source format, so the frame list has the same mix of codecs as the input.
+    Without pyvips (or for an image it can't load or save) the original is used and ffmpeg's scale filter resizes.
+    """
+    if pyvips is None:
+        return list(image_paths)
+
+    frames = []
+    for i, img_path in enumerate(image_paths):
+        ext = os.path.splitext(img_path)[1].lower()
+        out_path = os.path.join(work_dir, f"{i:05d}{ext}")
+        try:
+            # Opening only reads the header, so the size check is cheap
+            header = pyvips.Image.new_from_file(img_path, access="sequential")
+            if header.width <= target_size[0] and header.height <= target_size[1]:
+                frames.append(img_path)
+                continue
+            # thumbnail() uses JPEG shrink-on-load, so a huge photo is never fully decoded;
+            # no_rotate matches ffmpeg, which ignores EXIF orientation for the other images
+            small = pyvips.Image.thumbnail(img_path, target_size[0], height=target_size[1],
+                                           size="down", no_rotate=True)
+            if ext in (".jpg", ".jpeg"):
+                small.write_to_file(out_path, Q=90)
+            else:
+                small.write_to_file(out_path)
+        except pyvips.Error:
+            # libvips can't read or write this one; leave it to ffmpeg
+            frames.append(img_path)
+            continue
+        frames.append(out_path)
+    return frames
+
 def create_video_with_music(image_paths, output_video_path, fps=24, duration_per_image=2, volume=0.5):
     """
     Creates a 16:9 video from images, adds background music, and handles cleanup.
@@ -99,29 +170,23 @@ def create_video_with_music(image_paths, output_video_path, fps=24, duration_per
         print("No images found to create a video.")
         return
 
-    # --- Create Video Clips ---
-    target_size = (1920, 1080)  # Standard 16:9 aspect ratio
-    clips = []
-    for img_path in image_paths:
-        # Create a black background clip
-        bg_clip = ColorClip(size=target_size, color=(0, 0, 0), duration=duration_per_image)
-        
-        # Create an image clip and set its duration
-        img_clip = ImageClip(img_path).set_duration(duration_per_image)
-
-        # --- New Resizing Logic to Preserve Quality ---
-        # Don't upscale images smaller than the target frame.
-        if img_clip.size[0] > target_size[0] or img_clip.size[1] > target_size[1]:
-            # Resize only if the image is larger than the frame, maintaining aspect ratio.
-            img_clip = img_clip.resize(height=target_size[1])
-            if img_clip.size[0] > target_size[0]:
-                img_clip = img_clip.resize(width=target_size[0])
-
-        # Center the (potentially resized) image on the black background
-        final_image_clip = CompositeVideoClip([bg_clip, img_clip.set_position("center")])
-        clips.append(final_image_clip)
-        
-    final_clip = concatenate_videoclips(clips, method="compose")
+    target_w, target_h = 1920, 1080  # Standard 16:9 aspect ratio
+    total_duration = len(image_paths) * duration_per_image
+
+    frames_per_image = max(1, round(fps * duration_per_image))
+
+    # Shrink (never upscale) each image to fit the frame, then center it on black;
+    # concat needs every clip at the same size, SAR and pixel format.
+    # Each image is decoded and scaled once; loop then repeats that one frame for its duration
+    frame_filter = (
+        f"scale='min({target_w},iw)':'min({target_h},ih)':force_original_aspect_ratio=decrease,"
+        f"pad={target_w}:{target_h}:(ow-iw)/2:(oh-ih)/2:color=black,"
+        f"setsar=1,format=yuv420p,"
+        f"loop=loop={frames_per_image - 1}:size=1:start=0,setpts=N/({fps}*TB)"
+    )
+    n = len(image_paths)
+    filter_graph = "".join(f"[{i}:v]{frame_filter}[v{i}];" for i in range(n))
+    filter_graph += "".join(f"[v{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0[vout]"
 
     # --- Add Audio ---
     music_path = None
@@ -130,30 +195,35 @@ def create_video_with_music(image_paths, output_video_path, fps=24, duration_per
         music_path = get_freesound_music(query=query)
         if music_path:
             break # Stop once we find a suitable track
-    
+
+    work_dir = None
     try:
+        # --- Shrink oversized images ---
+        work_dir = tempfile.mkdtemp()
+        frames = shrink_images(image_paths, (target_w, target_h), work_dir)
+
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-stats"]
+        for img_path in frames:
+            # one input per image, so JPEG and PNG sources can be mixed freely
+            cmd += ["-i", img_path]
         if music_path:
-            music = AudioFileClip(music_path).volumex(volume)
-            if music.duration < final_clip.duration:
-                music = music.fx(vfx.loop, duration=final_clip.duration)
-            else:
-                music = music.subclip(0, final_clip.duration)
-            
-            final_clip = final_clip.set_audio(music)
+            # Loop the track so it always covers the video; -t trims it to length
+            cmd += ["-stream_loop", "-1", "-i", music_path]
         else:
             print("Could not find suitable music. Video will have no audio.")
 
         # --- Write Video File with High-Quality Settings ---
-        final_clip.write_videofile(
-            output_video_path,
-            codec='libx264',
-            bitrate='8000k',       # Set a high bitrate for better quality
-            preset='slow',         # Use a slower preset for better compression
-            fps=fps,
-            audio_codec="aac"
-        )
+        cmd += ["-filter_complex", filter_graph, "-map", "[vout]", "-r", str(fps)] + video_encoder_args()
+        if music_path:
+            # the music is the input after the n images
+            cmd += ["-map", f"{n}:a:0", "-af", f"volume={volume}", "-c:a", "aac"]
+        cmd += ["-t", str(total_duration), output_video_path]
+
+        subprocess.run(cmd, check=True)
         print(f"\n✅ Video saved successfully to: {output_video_path}")
 
     finally:
         # --- Cleanup ---
-        cleanup_temp_file(music_path)
\ No newline at end of file
+        cleanup_temp_file(music_path)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)